@@ -1,13 +1,17 @@
 from rich import print
 from rich.console import Console
 from dotenv import load_dotenv
-from urllib.parse import unquote
+from urllib.parse import unquote, urlparse, parse_qs
 import os
 import requests
 import re
 import json
 import sqlite3
+import time
+import logging
 import google.generativeai as genai
+from recorder import SessionRecorder
+from prompt_builder import Catalog, PromptBuilder, prompt_stats
 
 # Load API key
 load_dotenv()
@@ -17,8 +21,11 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel("gemini-2.0-flash")
 
-API_BASE = "http://127.0.0.1:8000"
-console = Console()
+API_BASE = os.getenv("API_BASE", "http://127.0.0.1:8000")
+DISTINCT_LIMIT = 100
+recorder = SessionRecorder.from_env()
+console = Console(record=recorder.enabled)
+logger = logging.getLogger("chatbot")
 
 def get_device_names_and_types():
     db_path = "./equipment.db"
@@ -38,33 +45,35 @@ def get_device_names_and_types():
     }
 
 DEVICE_TYPE_LISTS = get_device_names_and_types()
+prompt_builder = PromptBuilder(Catalog.from_databases())
+
+SUBTYPE_PLACEHOLDERS = {
+    "router": "routers", "routers": "routers",
+    "switch": "switches", "switches": "switches",
+    "device": "all", "devices": "all",
+}
 
 def expand_equipment_subtype(endpoint):
-    if "equipment_subtype=router" in endpoint:
-        endpoint = endpoint.replace(
-            "equipment_subtype=router",
-            "equipment_subtype=" + ",".join(DEVICE_TYPE_LISTS.get("routers", []))
-        )
-    if "equipment_subtype=switch" in endpoint:
-        endpoint = endpoint.replace(
-            "equipment_subtype=switch",
-            "equipment_subtype=" + ",".join(DEVICE_TYPE_LISTS.get("switches", []))
-        )
-    if "equipment_subtype=devices" in endpoint or "equipment_subtype=device" in endpoint:
-        endpoint = endpoint.replace(
-            "equipment_subtype=devices",
-            "equipment_subtype=" + ",".join(DEVICE_TYPE_LISTS.get("all", []))
-        )
-        endpoint = endpoint.replace(
-            "equipment_subtype=device",
-            "equipment_subtype=" + ",".join(DEVICE_TYPE_LISTS.get("all", []))
-        )
-    return endpoint
+    # Each comma-separated value is expanded on its own, so "switch,router" becomes both lists and real subtypes are kept
+    def expand(match):
+        values = match.group(1).split(",")
+        if not any(v.strip().lower() in SUBTYPE_PLACEHOLDERS for v in values):
+            return match.group(0)
+        expanded = []
+        for value in values:
+            group = SUBTYPE_PLACEHOLDERS.get(value.strip().lower())
+            expanded.extend(DEVICE_TYPE_LISTS.get(group, []) if group else [value])
+        return "equipment_subtype=" + ",".join(dict.fromkeys(expanded))
+    return re.sub(r'equipment_subtype=([^&]*)', expand, endpoint)
 
 def normalize_query_params_in_endpoint(endpoint):
     def lower_param(match):
         return f"{match.group(1)}={match.group(2).lower()}"
     endpoint = re.sub(r'(pop_name|equipment_subtype|equipment_subtype_code|hostname|pop_code|pop_name)=([^&]*)', lower_param, endpoint)
+    if "/distinct/" in endpoint:
+        if "count_only=" not in endpoint and "limit=" not in endpoint:
+            endpoint += f"&limit={DISTINCT_LIMIT}" if "?" in endpoint else f"?limit={DISTINCT_LIMIT}"
+        return endpoint
     if "count" not in endpoint and "limit=" not in endpoint and "groupcount" not in endpoint and "groupavg" not in endpoint:
         if "?" in endpoint:
             endpoint += "&limit=10"
@@ -73,100 +82,41 @@ def normalize_query_params_in_endpoint(endpoint):
     return endpoint
 
 def ask_gemini(user_query):
-    equipment_columns = [
-        "equipment_id", "hostname", "ip_address", "model_name", "pop_id", "pop_code", "pop_name", "equipment_subtype_code", "equipment_subtype",
-        "oem_code", "oem_name", "model_code"
-    ]
-    pop_columns = [
-        "pop_id", "pop_code", "pop_name", "pop_address", "category", "latitude", "longitude", "pop_type", "pop_tier", "region_code",
-        "territory_code", "zone_code", "division_code", "state_name", "circle_name", "billing_region_code", "billing_territory_code"
-    ]
-    prompt = f"""
-You are an API query interpreter for a FastAPI backend with two main entities: 'equipment' and 'pop'.
-
-Instructions:
-- For any count query (e.g., "How many X with Y?"), use the /equipment/count/ or /pop/count/ endpoint, passing all relevant fields as query parameters. You can count by any field.
-- For list queries, always add limit=10 to the endpoint unless the user requests a different limit.
-- If the user asks for a specific field (like "ip_address of devices in Agartala"), the endpoint must include the correct filter (e.g., /equipment/?pop_name=Agartala&fields=ip_address&limit=10).
-- If the user asks for a specific device type, use the 'equipment_subtype' field to filter.
-- If the user asks for a specific item by ID, the endpoint should include it (e.g., /pop/1010010).
-- If filters like location, IP address, name, etc., are mentioned, add them as query parameters (e.g., /pop/?state_name=Delhi&limit=10).
-- Always return a clean JSON dictionary with only these keys: "entity", "endpoint", "fields".
-- Do NOT include extra fields or the entire database; only include the fields the user requested.
-- If the user asks "which location has the highest/second highest/third highest/lowest/second lowest/third lowest/average/least number of X", use the /equipment/groupcount/ or /pop/groupcount/ endpoint with group_by set to the relevant field (e.g., pop_name, location, state_name, etc.), and the relevant filters (e.g., equipment_subtype=router for routers). Use order=desc for highest, order=asc for lowest, and limit=3 for top/bottom 3. For average, use /equipment/groupavg/ or /pop/groupavg/ with avg_field set to the field to average. Return the relevant result (top, second, third, least, average, etc.).
-- If the user asks for a list, always include limit=10 in the endpoint unless otherwise specified.
-- If the user asks for a count, always use the /equipment/count/ or /pop/count/ endpoint with all relevant filters.
-- If the user asks "list all types of X" or "what are the types of X" or "show all unique values of X", use the /equipment/distinct/?field=X or /pop/distinct/?field=X endpoint, depending on which entity X belongs to.
-- If the user asks "how many types of X are there" or "number of unique X", use the /equipment/distinct/?field=X or /pop/distinct/?field=X endpoint, and count the number of results.
-- If the user asks "list all the devices that are present in (specific oem_name)", use /equipment/?oem_name=<name>&limit=10.
-- Always return a clean JSON dictionary with only these keys: "entity", "endpoint", "fields".
-
-FIELD VALUE NORMALIZATION:
-
-Always normalize user-provided values to match real database entries — even if they're partial, lowercase, hyphenated, misspelled, abbreviated, or space-separated.
-
-You must do this normalization on *ALL queryable fields*, including:
-- model_name, oem_name, hostname, pop_name, pop_code, state_name, equipment_subtype, etc.
-
-Specifically:
-- "d link", "dlink", "d-link", "drink" should be "D-Link"
-- "ecs2100", "ecs-2100", "ecs 2100" → "ECS-2100"
-- "juniper", "junipr", "jun per" → "Juniper"
-- "fiberhome", "fiber home", "fiber-home" → "Fiberhome"
-- "bng" → "Broadband Network Gateway"
-- "uttarpradesh", "uttar pradesh", "up" → "Uttar Pradesh"
-- "delhi", "dilli" → "Delhi"
-- "agartla", "agartaala", "agartala" → "Agartala"
-
-If a user says:
-- "how many d link switches", you MUST rewrite the endpoint using oem_name=D-Link
-- "how many cisco routers" → oem_name=Cisco
-- "devices with ecs2100 model" → model_name=ECS-2100
-
-Do *not* pass fuzzy or ambiguous user values directly to the API — always transform them into the *correct value from the database* using reasoning and known patterns.
-
-Your job is to understand the intent and correct any field value before forming the endpoint.
-
-Device classification rule:
-- Use these lists for classification:
-  - Switches: {DEVICE_TYPE_LISTS.get("switches", [])}
-  - Routers: {DEVICE_TYPE_LISTS.get("routers", [])}
-  - All: {DEVICE_TYPE_LISTS.get("all", [])}
-- When the user asks for "switches", always add equipment_subtype=<comma-separated switches> as a query parameter in the endpoint.
-- When the user asks for "routers", always add equipment_subtype=<comma-separated routers> as a query parameter in the endpoint.
-- When the user asks for "devices", always add equipment_subtype=<comma-separated routers and switches> as a query parameter in the endpoint.
-- Always use the correct filters in the endpoint, including pop_name, equipment_subtype, etc., as needed.
-
-Available columns for 'equipment': {equipment_columns}
-Available columns for 'pop': {pop_columns}
-
-User query: {user_query}
-"""
-    response = model.generate_content(prompt)
-    text = response.text.strip()
+    prompt, stats = prompt_builder.build(user_query)
+    text = generate(prompt, stats)
     if text.startswith(""):
         text = re.sub(r"json|```", "", text).strip()
     return text
 
-def fetch_api(endpoint):
-    endpoint = unquote(endpoint)
-    url = API_BASE + endpoint
-    response = requests.get(url)
+def generate(prompt, stats=None):
+    stats = stats or prompt_stats(prompt)
+    start = time.perf_counter()
+    text = model.generate_content(prompt).text.strip()
+    seconds = time.perf_counter() - start
+    logger.info("llm call: %d chars, ~%d tokens, %.3fs, sections=%s", stats["chars"], stats["tokens"], seconds, stats["sections"])
+    recorder.record_llm(prompt, text, seconds, stats)
+    return text
+
+def http_get(endpoint):
+    start = time.perf_counter()
+    response = requests.get(API_BASE + endpoint)
     try:
         data = response.json()
     except Exception:
         data = {}
+    recorder.record_api(endpoint, response.status_code, data, time.perf_counter() - start)
+    return data
+
+def fetch_api(endpoint):
+    endpoint = unquote(endpoint)
+    data = http_get(endpoint)
     # Fallback: If no results, try to relax the query (remove pop_name filter)
     if (isinstance(data, list) and not data) or (isinstance(data, dict) and not data):
         if "pop_name=" in endpoint:
             new_endpoint = re.sub(r'(&|\?)pop_name=[^&]*', '', endpoint)
             new_endpoint = new_endpoint.replace('&&', '&').replace('?&', '?')
-            print(f"[magenta]Retrying without pop_name filter: {API_BASE + new_endpoint}[/magenta]")
-            response = requests.get(API_BASE + new_endpoint)
-            try:
-                data = response.json()
-            except Exception:
-                data = {}
+            console.print(f"[magenta]Retrying without pop_name filter: {API_BASE + new_endpoint}[/magenta]")
+            data = http_get(new_endpoint)
     return data
 
 def extract_fields(data, fields):
@@ -199,49 +149,64 @@ def multi_api_fetch(endpoints, fields):
         results.extend(filtered if isinstance(filtered, list) else [filtered])
     return results
 
-def main():
-    console.print("[bold green]Welcome to the Gemini-Powered Equipment & POP Chatbot![/bold green]")
-    while True:
-        user_input = console.input("\n[bold blue]You:[/bold blue] ")
-
-        if user_input.lower() in ["exit", "quit"]:
-            print("[bold red]Goodbye![/bold red]")
-            break
-
-        try:
-            gemini_response = ask_gemini(user_input)
-            interpretation = json.loads(gemini_response)
+def is_count_only(endpoint):
+    return re.search(r'[?&]count_only=(true|1)(&|$)', endpoint, flags=re.IGNORECASE) is not None
+
+def print_distinct_values(endpoint, values):
+    if not isinstance(values, list) or not values:
+        console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
+        return
+    console.print("\n[bold yellow]🔍 Result:[/bold yellow]")
+    console.print(values)
+    params = parse_qs(urlparse(endpoint).query)
+    limit = int(params["limit"][0]) if "limit" in params else None
+    offset = int(params.get("offset", ["0"])[0])
+    if limit is not None and len(values) == limit:
+        console.print(
+            f"[yellow]Showing values {offset + 1}-{offset + len(values)}; there may be more. "
+            f"Ask for them from offset {offset + limit} to see the next page.[/yellow]"
+        )
 
-            # If Gemini returns a list of endpoints, call all and aggregate
-            if isinstance(interpretation, list):
-                endpoints = []
-                for item in interpretation:
-                    endpoint = expand_equipment_subtype(item["endpoint"])
-                    endpoint = normalize_query_params_in_endpoint(endpoint)
-                    endpoints.append((endpoint, item["fields"]))
-                results = multi_api_fetch(endpoints, [item["fields"] for item in interpretation])
-                if not results or results == [{}] or results == [[]] or all((r == {} or r == [] or r is None) for r in results):
-                    console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
-                else:
-                    console.print("\n[bold yellow]🔍 Result:[/bold yellow]")
-                    console.print(results)
-                continue
+def handle_turn(user_input):
+    gemini_response = ask_gemini(user_input)
+    interpretation = json.loads(gemini_response)
 
-            endpoint = expand_equipment_subtype(interpretation["endpoint"])
+    # If Gemini returns a list of endpoints, call all and aggregate
+    if isinstance(interpretation, list):
+        endpoints = []
+        for item in interpretation:
+            endpoint = expand_equipment_subtype(item["endpoint"])
             endpoint = normalize_query_params_in_endpoint(endpoint)
-            fields = interpretation["fields"]
-            
-            if "/distinct/" in endpoint and ("how many" in user_input.lower() or "number of" in user_input.lower()):
-                api_response = fetch_api(endpoint)
-                count = len(api_response) if isinstance(api_response, list) else 0
-                console.print(f"\n[bold yellow]🔢 Number of types:[/bold yellow] {count}")
-                continue
+            endpoints.append((endpoint, item["fields"]))
+        results = multi_api_fetch(endpoints, [item["fields"] for item in interpretation])
+        if not results or results == [{}] or results == [[]] or all((r == {} or r == [] or r is None) for r in results):
+            console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
+        else:
+            console.print("\n[bold yellow]🔍 Result:[/bold yellow]")
+            console.print(results)
+        return
+
+    endpoint = expand_equipment_subtype(interpretation["endpoint"])
+    endpoint = normalize_query_params_in_endpoint(endpoint)
+    fields = interpretation["fields"]
+    
+    if "/distinct/" in endpoint:
+        if not is_count_only(endpoint) and ("how many" in user_input.lower() or "number of" in user_input.lower()):
+            endpoint = re.sub(r'([?&])limit=[^&]*&?', r'\1', endpoint).rstrip("?&")
+            endpoint += "&count_only=true" if "?" in endpoint else "?count_only=true"
+        api_response = fetch_api(endpoint)
+        if is_count_only(endpoint):
+            count = api_response.get("count", 0) if isinstance(api_response, dict) else 0
+            console.print(f"\n[bold yellow]🔢 Number of types:[/bold yellow] {count}")
+        else:
+            print_distinct_values(endpoint, api_response)
+        return
 
-            api_response = fetch_api(endpoint)
+    api_response = fetch_api(endpoint)
 
-            # --- Updated: Let Gemini handle greatest/lowest logic ---
-            if "/equipment/groupcount/" in endpoint or "/pop/groupcount/" in endpoint:
-                llm_prompt = f"""
+    # --- Updated: Let Gemini handle greatest/lowest logic ---
+    if "/equipment/groupcount/" in endpoint or "/pop/groupcount/" in endpoint:
+        llm_prompt = f"""
 You are a helpful assistant. The user asked: "{user_input}"
 
 Here is the data returned from the API (as a JSON array or object):
@@ -252,29 +217,50 @@ Analyze the data and answer the user's question in a clear, human-readable way.
 If the user asks for the highest, lowest, second highest, second lowest, etc., find and report the correct value(s) from the data.
 If the data is empty, say "No results found for your query."
 """
-                response = model.generate_content(llm_prompt)
-                llm_answer = response.text.strip()
-                console.print(f"\n[bold yellow]{llm_answer}[/bold yellow]")
-                continue
+        llm_answer = generate(llm_prompt)
+        console.print(f"\n[bold yellow]{llm_answer}[/bold yellow]")
+        return
+
+    if "/equipment/groupavg/" in endpoint or "/pop/groupavg/" in endpoint:
+        if isinstance(api_response, list) and api_response:
+            console.print(f"\n[bold yellow]Averages:[/bold yellow] {api_response}")
+        else:
+            console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
+        return
+
+    filtered = extract_fields(api_response, fields)
+    if fields == ["count"] and isinstance(filtered, dict) and "count" in filtered:
+        console.print(f"\n[bold yellow]🔢 Number:[/bold yellow] {filtered['count']}")
+    elif not filtered or filtered == [{}] or filtered == [] or filtered is None:
+        console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
+    else:
+        console.print("\n[bold yellow]🔍 Result:[/bold yellow]")
+        console.print(filtered)
+
+def run_turn(user_input):
+    recorder.start_turn(user_input)
+    if console.record:
+        console.export_text(clear=True)
+    error = None
+    try:
+        handle_turn(user_input)
+    except Exception as e:
+        error = str(e)
+        console.print(f"[red]Error: {e}[/red]")
+    output = console.export_text(clear=True) if console.record else ""
+    return recorder.end_turn(output, error)
 
-            if "/equipment/groupavg/" in endpoint or "/pop/groupavg/" in endpoint:
-                if isinstance(api_response, list) and api_response:
-                    console.print(f"\n[bold yellow]Averages:[/bold yellow] {api_response}")
-                else:
-                    console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
-                continue
+def main():
+    logging.basicConfig(filename=os.getenv("CHATBOT_LOG", "chatbot.log"), level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    console.print("[bold green]Welcome to the Gemini-Powered Equipment & POP Chatbot![/bold green]")
+    while True:
+        user_input = console.input("\n[bold blue]You:[/bold blue] ")
 
-            filtered = extract_fields(api_response, fields)
-            if fields == ["count"] and isinstance(filtered, dict) and "count" in filtered:
-                console.print(f"\n[bold yellow]🔢 Number:[/bold yellow] {filtered['count']}")
-            elif not filtered or filtered == [{}] or filtered == [] or filtered is None:
-                console.print("\n[bold yellow]No results found for your query.[/bold yellow]")
-            else:
-                console.print("\n[bold yellow]🔍 Result:[/bold yellow]")
-                console.print(filtered)
+        if user_input.lower() in ["exit", "quit"]:
+            print("[bold red]Goodbye![/bold red]")
+            break
 
-        except Exception as e:
-            console.print(f"[red]Error: {e}[/red]")
+        run_turn(user_input)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,8 +2,11 @@ from fastapi import FastAPI, HTTPException, Query, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
-from sqlalchemy import create_engine, Column, Integer, String, Float, func, select, text
+from sqlalchemy import create_engine, Column, Integer, String, Float, func, select, text, distinct
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+import hashlib
+import math
+import sharding
 
 EQUIPMENT_DB_URL = "sqlite:///./equipment.db"
 POP_DB_URL = "sqlite:///./pop.db"
@@ -109,6 +112,14 @@ app = FastAPI(
     description="API to access and manage equipment and POP data from two SQLite databases."
 )
 
+EQUIPMENT_FILTER_FIELDS = [
+    "equipment_id", "pop_id", "hostname", "pop_code", "pop_name", "equipment_subtype_code", "equipment_subtype",
+    "oem_code", "oem_name", "model_code", "ip_address", "model_name", "state_name"
+]
+
+def equipment_filter_params(params):
+    return {k: params.get(k) for k in EQUIPMENT_FILTER_FIELDS if params.get(k)}
+
 def apply_equipment_filters(query, params):
     if params.get("equipment_id"):
         query = query.filter(EquipmentORM.equipment_id == int(params["equipment_id"]))
@@ -176,6 +187,72 @@ def apply_pop_filters(query, params):
         query = query.filter(func.lower(PopORM.billing_territory_code).like(f"%{params['billing_territory_code'].lower()}%"))
     return query
 
+def apply_equipment_distinct_filters(query, params):
+    if params.get("pop_name"):
+        query = query.filter(func.lower(EquipmentORM.pop_name) == params["pop_name"].lower())
+    if params.get("hostname"):
+        query = query.filter(func.lower(EquipmentORM.hostname) == params["hostname"].lower())
+    if params.get("ip_address"):
+        query = query.filter(func.lower(EquipmentORM.ip_address) == params["ip_address"].lower())
+    if params.get("equipment_subtype"):
+        subtype_list = [x.strip().lower() for x in params["equipment_subtype"].split(",")]
+        query = query.filter(func.lower(EquipmentORM.equipment_subtype).in_(subtype_list))
+    return query
+
+HLL_PRECISION = 14
+HLL_BATCH_SIZE = 10000
+
+class HyperLogLog:
+    # Fixed-memory distinct counter; standard error is about 1.04 / sqrt(2 ** precision).
+    # Only used for sharded storage, where merging registers avoids shipping every value between processes.
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        x = int.from_bytes(digest, "big")
+        width = 64 - self.precision
+        index = x >> width
+        rank = width - (x & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+def filter_distinct(query, column, prefix=None, drop_empty=True):
+    query = query.filter(column.isnot(None))
+    if drop_empty:
+        query = query.filter(column != "")
+    if prefix:
+        query = query.filter(func.lower(column).like(f"{prefix.lower()}%"))
+    return query
+
+def distinct_hll(query):
+    hll = HyperLogLog()
+    for row in query.yield_per(HLL_BATCH_SIZE):
+        hll.add(row[0])
+    return hll
+
+def apply_distinct_options(query, column, prefix=None, count_only=False, offset=0, limit=None, drop_empty=True):
+    query = filter_distinct(query, column, prefix, drop_empty)
+    if count_only:
+        return {"count": query.with_entities(func.count(distinct(column))).scalar()}
+    query = query.distinct().order_by(column).offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return [r[0] for r in query.all()]
+
 
 
 @app.get("/equipment/")
@@ -194,7 +271,7 @@ def get_equipment(
     model_name: Optional[str] = Query(None),
     state_name: Optional[str] = Query(None),
     fields: Optional[str] = Query(None),
-    limit: int = Query(10),
+    limit: int = Query(10, ge=1),
     db: Session = Depends(get_equipment_db)
 ):
     # only include filterable fields
@@ -214,6 +291,13 @@ def get_equipment(
         "state_name": state_name
     }
 
+    if sharding.enabled():
+        results = sharding.equipment_list(equipment_filter_params(filterable_params), limit)
+        if fields:
+            fields_list = [f.strip() for f in fields.split(",")]
+            return JSONResponse(content=[{k: r.get(k) for k in fields_list} for r in results])
+        return results
+
     query = db.query(EquipmentORM)
     query = apply_equipment_filters(query, filterable_params)
     results = query.limit(limit).all()
@@ -228,7 +312,10 @@ def get_equipment(
 
 @app.get("/equipment/{equipment_id}", response_model=Equipment)
 def get_equipment_by_id(equipment_id: int, db: Session = Depends(get_equipment_db)):
-    result = db.query(EquipmentORM).filter(EquipmentORM.equipment_id == equipment_id).first()
+    if sharding.enabled():
+        result = sharding.equipment_by_id(equipment_id)
+    else:
+        result = db.query(EquipmentORM).filter(EquipmentORM.equipment_id == equipment_id).first()
     if not result:
         raise HTTPException(status_code=404, detail="Equipment not found")
     return result
@@ -251,6 +338,8 @@ def get_equipment_count(
     db: Session = Depends(get_equipment_db)
 ):
     params = locals()
+    if sharding.enabled():
+        return {"count": sharding.equipment_count(equipment_filter_params(params))}
     query = db.query(func.count(EquipmentORM.equipment_id))
     query = apply_equipment_filters(query, params)
     count = query.scalar()
@@ -263,11 +352,13 @@ def get_equipment_groupcount(
     oem_name: Optional[str] = Query(None),
     model_code: Optional[str] = Query(None),
     order: str = Query("desc", description="desc for highest, asc for lowest"),
-    limit: int = Query(10, description="How many top/bottom results to return"),
+    limit: int = Query(10, ge=1, description="How many top/bottom results to return"),
     db: Session = Depends(get_equipment_db)
 ):
     if not hasattr(EquipmentORM, group_by):
         raise HTTPException(status_code=400, detail=f"Invalid group_by field: {group_by}")
+    if sharding.enabled():
+        return sharding.equipment_groupcount(equipment_filter_params(locals()), group_by, order, limit)
     group_col = getattr(EquipmentORM, group_by)
     query = db.query(group_col, func.count(EquipmentORM.equipment_id).label("count"))
     params = locals()
@@ -288,11 +379,13 @@ def get_equipment_groupavg(
     oem_name: Optional[str] = Query(None),
     model_code: Optional[str] = Query(None),
     order: str = Query("desc", description="desc for highest, asc for lowest"),
-    limit: int = Query(10, description="How many top/bottom results to return"),
+    limit: int = Query(10, ge=1, description="How many top/bottom results to return"),
     db: Session = Depends(get_equipment_db)
 ):
     if not hasattr(EquipmentORM, group_by) or not hasattr(EquipmentORM, avg_field):
         raise HTTPException(status_code=400, detail=f"Invalid group_by or avg_field")
+    if sharding.enabled():
+        return sharding.equipment_groupavg(equipment_filter_params(locals()), group_by, avg_field, order, limit)
     group_col = getattr(EquipmentORM, group_by)
     avg_col = getattr(EquipmentORM, avg_field)
     query = db.query(group_col, func.avg(avg_col).label("average"))
@@ -314,26 +407,30 @@ def get_distinct_equipment_field(
     hostname: Optional[str] = None,
     ip_address: Optional[str] = None,
     equipment_subtype: Optional[str] = None,
+    prefix: Optional[str] = Query(None, description="Only values starting with this prefix (case-insensitive)"),
+    count_only: bool = Query(False, description="Return {\"count\": n} using COUNT(DISTINCT) instead of the values"),
+    approx: bool = Query(False, description="Return a count that may be approximate: sharded storage merges per-shard HyperLogLog sketches, a single file uses the exact COUNT(DISTINCT) and reports approximate=false"),
+    offset: int = Query(0, ge=0, description="Number of sorted distinct values to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of distinct values to return"),
 ):
+    if field not in EquipmentORM.__table__.columns.keys():
+        raise HTTPException(status_code=400, detail=f"Invalid field: {field}")
+    params = {"pop_name": pop_name, "hostname": hostname, "ip_address": ip_address, "equipment_subtype": equipment_subtype}
+    if sharding.enabled():
+        return sharding.equipment_distinct(params, field, prefix, count_only, approx, offset, limit)
     column = getattr(EquipmentORM, field)
-    query = db.query(column)
-
-    if pop_name:
-        query = query.filter(func.lower(EquipmentORM.pop_name) == pop_name.lower())
-    if hostname:
-        query = query.filter(func.lower(EquipmentORM.hostname) == hostname.lower())
-    if ip_address:
-        query = query.filter(func.lower(EquipmentORM.ip_address) == ip_address.lower())
-    if equipment_subtype:
-        subtype_list = [x.strip().lower() for x in equipment_subtype.split(",")]
-        query = query.filter(func.lower(EquipmentORM.equipment_subtype).in_(subtype_list))
-
-    results = query.distinct().all()
-    return [r[0] for r in results if r[0]]
+    query = apply_equipment_distinct_filters(db.query(column), params)
+    if approx:
+        # A single file has no estimator cheaper than SQLite's own COUNT(DISTINCT)
+        return {**apply_distinct_options(query, column, prefix, count_only=True), "approximate": False}
+    return apply_distinct_options(query, column, prefix, count_only, offset, limit)
 
 @app.get("/equipment/subtypes/", response_model=Dict[str, List[str]])
 def get_equipment_subtypes(db: Session = Depends(get_equipment_db)):
-    all_types = [row[0] for row in db.query(EquipmentORM.equipment_subtype).distinct() if row[0]]
+    if sharding.enabled():
+        all_types = sharding.equipment_distinct({}, "equipment_subtype", None, False, False, 0, None)
+    else:
+        all_types = [row[0] for row in db.query(EquipmentORM.equipment_subtype).distinct() if row[0]]
     switches = [t for t in all_types if "switch" in t.lower()]
     routers = [t for t in all_types if t not in switches]
     return {
@@ -411,12 +508,19 @@ def get_pop_count(
     return {"count": count}
 
 @app.get("/pop/distinct/")
-def get_pop_distinct(field: str, db: Session = Depends(get_pop_db)):
-    if not hasattr(PopORM, field):
+def get_pop_distinct(
+    field: str,
+    prefix: Optional[str] = Query(None, description="Only values starting with this prefix (case-insensitive)"),
+    count_only: bool = Query(False, description="Return {\"count\": n} using COUNT(DISTINCT) instead of the values"),
+    offset: int = Query(0, ge=0, description="Number of sorted distinct values to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of distinct values to return"),
+    db: Session = Depends(get_pop_db)
+):
+    if field not in PopORM.__table__.columns.keys():
         raise HTTPException(status_code=400, detail=f"Invalid field: {field}")
     col = getattr(PopORM, field)
-    results = db.query(col).distinct().all()
-    return [r[0] for r in results if r[0] is not None]
+    # Unlike equipment, /pop/distinct/ has always kept empty strings and only skipped NULL
+    return apply_distinct_options(db.query(col), col, prefix, count_only, offset, limit, drop_empty=False)
 
 @app.get("/pop/groupcount/")
 def get_pop_groupcount(
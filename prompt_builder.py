@@ -0,0 +1,152 @@
+import math
+import os
+import re
+import sqlite3
+from collections import defaultdict
+
+CHARS_PER_TOKEN = 4
+CANDIDATES_PER_FIELD = 5
+MATCH_THRESHOLD = 0.5
+
+EQUIPMENT_COLUMNS = [
+    "equipment_id", "hostname", "ip_address", "model_name", "pop_id", "pop_code", "pop_name", "equipment_subtype_code", "equipment_subtype",
+    "oem_code", "oem_name", "model_code"
+]
+POP_COLUMNS = [
+    "pop_id", "pop_code", "pop_name", "pop_address", "category", "latitude", "longitude", "pop_type", "pop_tier", "region_code",
+    "territory_code", "zone_code", "division_code", "state_name", "circle_name", "billing_region_code", "billing_territory_code"
+]
+
+# (database, table, column) pairs whose values are offered to the model as normalization candidates
+CATALOG_FIELDS = [
+    ("./equipment.db", "equipment", "equipment_subtype"),
+    ("./equipment.db", "equipment", "oem_name"),
+    ("./equipment.db", "equipment", "model_name"),
+    ("./equipment.db", "equipment", "pop_name"),
+    ("./pop.db", "pop", "state_name"),
+]
+
+INSTRUCTIONS = """You are an API query interpreter for a FastAPI backend with two main entities: 'equipment' and 'pop'.
+
+Instructions:
+- Always return a clean JSON dictionary with only these keys: "entity", "endpoint", "fields". Only include the fields the user requested.
+- For any count query (e.g., "How many X with Y?"), use the /equipment/count/ or /pop/count/ endpoint, passing all relevant fields as query parameters. You can count by any field.
+- For list queries, always add limit=10 to the endpoint unless the user requests a different limit.
+- If filters like location, IP address, name, device type etc. are mentioned, add them as query parameters (e.g., /pop/?state_name=Delhi&limit=10, /equipment/?pop_name=Agartala&fields=ip_address&limit=10).
+- If the user asks for a specific item by ID, the endpoint should include it (e.g., /pop/1010010).
+- If the user asks "which location has the highest/second highest/lowest/least number of X", use /equipment/groupcount/ or /pop/groupcount/ with group_by set to the relevant field and the relevant filters. Use order=desc for highest, order=asc for lowest, and limit=3 for top/bottom 3. For averages, use /equipment/groupavg/ or /pop/groupavg/ with avg_field set to the field to average.
+- If the user asks "list all types of X" or "show all unique values of X", use /equipment/distinct/?field=X or /pop/distinct/?field=X, depending on which entity X belongs to. If the user asks for values starting with some text, add prefix=<text>. Listings return one page of values; if the user asks for more values or gives a starting offset, add offset=<number of values already shown>.
+- If the user asks "how many types of X are there" or "number of unique X", use /equipment/distinct/?field=X&count_only=true or /pop/distinct/?field=X&count_only=true.
+- If the user asks "list all the devices that are present in (specific oem_name)", use /equipment/?oem_name=<name>&limit=10."""
+
+NORMALIZATION = """FIELD VALUE NORMALIZATION:
+Always rewrite user-provided values (partial, lowercase, hyphenated, misspelled, abbreviated or space-separated) to the real database value before forming the endpoint, for every queryable field (model_name, oem_name, hostname, pop_name, pop_code, state_name, equipment_subtype, etc.). Never pass fuzzy values directly to the API.
+Examples: "d link"/"dlink"/"drink" -> "D-Link"; "ecs2100"/"ecs 2100" -> "ECS-2100"; "junipr"/"jun per" -> "Juniper"; "fiber home" -> "Fiberhome"; "bng" -> "Broadband Network Gateway"; "uttarpradesh"/"up" -> "Uttar Pradesh"; "dilli" -> "Delhi"; "agartla" -> "Agartala"."""
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _normalize(text):
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def _grams(text):
+    text = _normalize(text)
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class Catalog:
+    """Known field values with a trigram index for picking the ones a query refers to."""
+
+    def __init__(self, values):
+        self.values = {field: list(dict.fromkeys(v for v in vals if v)) for field, vals in values.items()}
+        self.index = {}
+        self.gram_counts = {}
+        for field, vals in self.values.items():
+            index = defaultdict(list)
+            counts = []
+            for i, value in enumerate(vals):
+                grams = _grams(value)
+                counts.append(len(grams))
+                for g in grams:
+                    index[g].append(i)
+            self.index[field] = index
+            self.gram_counts[field] = counts
+
+    @classmethod
+    def from_databases(cls, fields=CATALOG_FIELDS):
+        values = {}
+        for db_path, table, column in fields:
+            if not os.path.exists(db_path):
+                values[column] = []
+                continue
+            conn = sqlite3.connect(db_path)
+            try:
+                cursor = conn.execute(f"SELECT DISTINCT {column} FROM {table}")
+                values[column] = [row[0] for row in cursor.fetchall() if row[0]]
+            finally:
+                conn.close()
+        return cls(values)
+
+    def size(self, field):
+        return len(self.values.get(field, []))
+
+    def candidates(self, field, query, limit=CANDIDATES_PER_FIELD, threshold=MATCH_THRESHOLD):
+        if field not in self.index:
+            return []
+        query_grams = _grams(query) | {_normalize(w) for w in query.split()}
+        hits = defaultdict(int)
+        for g in query_grams:
+            for i in self.index[field].get(g, ()):
+                hits[i] += 1
+        counts = self.gram_counts[field]
+        scored = [(hits[i] / counts[i], i) for i in hits if hits[i] / counts[i] >= threshold]
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [self.values[field][i] for _, i in scored[:limit]]
+
+class PromptBuilder:
+    """Builds the ask_gemini prompt section by section and reports the estimated token cost of each."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def device_section(self, user_query):
+        lines = ["Device classification rule:"]
+        matches = self.catalog.candidates("equipment_subtype", user_query)
+        if matches:
+            lines.append(f"- equipment_subtype values matching the query: {', '.join(matches)}")
+        lines.append("- For \"switches\", \"routers\" or \"devices\" in general, add equipment_subtype=switch, equipment_subtype=router or equipment_subtype=devices (comma-separated to combine them, e.g. equipment_subtype=switch,router); these are expanded to the full subtype lists automatically.")
+        return "\n".join(lines)
+
+    def values_section(self, user_query):
+        lines = []
+        for field in self.catalog.values:
+            if field == "equipment_subtype":
+                continue
+            matches = self.catalog.candidates(field, user_query)
+            if matches:
+                lines.append(f"- {field}: {', '.join(matches)}")
+        if not lines:
+            return ""
+        return "Database values that may match the query:\n" + "\n".join(lines)
+
+    def build(self, user_query):
+        sections = [
+            ("instructions", INSTRUCTIONS),
+            ("normalization", NORMALIZATION),
+            ("values", self.values_section(user_query)),
+            ("devices", self.device_section(user_query)),
+            ("columns", f"Columns for 'equipment': {', '.join(EQUIPMENT_COLUMNS)}\nColumns for 'pop': {', '.join(POP_COLUMNS)}"),
+            ("query", f"User query: {user_query}"),
+        ]
+        sections = [(name, text) for name, text in sections if text]
+        prompt = "\n\n".join(text for _, text in sections)
+        stats = {
+            "chars": len(prompt),
+            "tokens": estimate_tokens(prompt),
+            "sections": {name: estimate_tokens(text) for name, text in sections},
+        }
+        return prompt, stats
+
+def prompt_stats(prompt):
+    return {"chars": len(prompt), "tokens": estimate_tokens(prompt), "sections": {}}
@@ -0,0 +1,81 @@
+import json
+import os
+import time
+import uuid
+
+RECORD_PATH_ENV = "CHATBOT_RECORD"
+
+class SessionRecorder:
+    """Writes one JSON line per chatbot turn: input, LLM calls, API calls and timings."""
+
+    def __init__(self, path=None, session_id=None):
+        self.path = path
+        self.session_id = session_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.turn_index = 0
+        self.turn = None
+        self.turn_started = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv(RECORD_PATH_ENV))
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def start_turn(self, user_input):
+        self.turn = {
+            "session_id": self.session_id,
+            "turn": self.turn_index,
+            "user_input": user_input,
+            "llm_calls": [],
+            "api_calls": [],
+        }
+        self.turn_started = time.perf_counter()
+
+    def record_llm(self, prompt, output, seconds, stats=None):
+        if self.turn is not None:
+            call = {"prompt": prompt, "output": output, "seconds": seconds}
+            if stats:
+                call["prompt_tokens"] = stats["tokens"]
+                call["sections"] = stats["sections"]
+            self.turn["llm_calls"].append(call)
+
+    def record_api(self, endpoint, status, response, seconds):
+        if self.turn is not None:
+            self.turn["api_calls"].append({
+                "endpoint": endpoint,
+                "status": status,
+                "response": response,
+                "seconds": seconds,
+            })
+
+    def end_turn(self, output="", error=None):
+        if self.turn is None:
+            return None
+        turn = self.turn
+        total = time.perf_counter() - self.turn_started
+        llm = sum(c["seconds"] for c in turn["llm_calls"])
+        api = sum(c["seconds"] for c in turn["api_calls"])
+        turn["output"] = output
+        turn["error"] = error
+        turn["timings"] = {"llm": llm, "api": api, "other": max(total - llm - api, 0.0), "total": total}
+        if self.enabled:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(turn, default=str) + "\n")
+        self.turn = None
+        self.turn_index += 1
+        return turn
+
+def load_sessions(path):
+    sessions = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            turn = json.loads(line)
+            sessions.setdefault(turn["session_id"], []).append(turn)
+    for turns in sessions.values():
+        turns.sort(key=lambda t: t["turn"])
+    return sessions
@@ -0,0 +1,186 @@
+import argparse
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import requests
+from rich.console import Console
+
+from recorder import SessionRecorder, load_sessions
+
+class StubModel:
+    """Offline stand-in for genai.GenerativeModel that replays recorded outputs in order."""
+
+    def __init__(self, base_latency=0.0, latency_per_kchar=0.0):
+        self.base_latency = base_latency
+        self.latency_per_kchar = latency_per_kchar
+        self.outputs = []
+
+    def load_turn(self, turn):
+        self.outputs = [c["output"] for c in turn["llm_calls"]]
+
+    def generate_content(self, prompt):
+        if not self.outputs:
+            raise RuntimeError("Stub model has no recorded output left for this turn")
+        delay = self.base_latency + self.latency_per_kchar * len(prompt) / 1000
+        if delay:
+            time.sleep(delay)
+        return SimpleNamespace(text=self.outputs.pop(0))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_api(port, timeout=30):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("main.py exited before it started serving")
+        try:
+            requests.get(base + "/openapi.json", timeout=1)
+            return proc, base
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"main.py did not start within {timeout}s")
+
+def replay_turn(chatbot, stub, recorded):
+    stub.load_turn(recorded)
+    turn = chatbot.run_turn(recorded["user_input"])
+    endpoints = [c["endpoint"] for c in turn["api_calls"]]
+    return {
+        "session_id": recorded["session_id"],
+        "turn": recorded["turn"],
+        "user_input": recorded["user_input"],
+        "timings": turn["timings"],
+        "llm_calls": len(turn["llm_calls"]),
+        "prompt_chars": sum(len(c["prompt"]) for c in turn["llm_calls"]),
+        "prompt_tokens": sum(c.get("prompt_tokens", 0) for c in turn["llm_calls"]),
+        "api_calls": len(endpoints),
+        "endpoints": dict(Counter(endpoints)),
+        "endpoints_match": endpoints == [c["endpoint"] for c in recorded["api_calls"]],
+        "output_matches": turn["output"] == recorded.get("output", ""),
+        "error": turn["error"],
+    }
+
+def summarize(turns):
+    totals = sorted(t["timings"]["total"] for t in turns)
+    endpoints = Counter()
+    for t in turns:
+        endpoints.update(t["endpoints"])
+    return {
+        "turns": len(turns),
+        "total": sum(totals),
+        "llm": sum(t["timings"]["llm"] for t in turns),
+        "api": sum(t["timings"]["api"] for t in turns),
+        "p50": statistics.median(totals) if totals else 0.0,
+        "p95": totals[int(0.95 * (len(totals) - 1))] if totals else 0.0,
+        "api_calls": sum(t["api_calls"] for t in turns),
+        "prompt_chars": sum(t["prompt_chars"] for t in turns),
+        "prompt_tokens": sum(t["prompt_tokens"] for t in turns),
+        "endpoints": dict(endpoints),
+        "mismatches": sum(1 for t in turns if not (t["endpoints_match"] and t["output_matches"])),
+    }
+
+def find_regressions(turns, baseline, tolerance, min_delta):
+    previous = {(t["session_id"], t["turn"]): t for t in baseline["turns"]}
+    regressions = []
+    for t in turns:
+        old = previous.get((t["session_id"], t["turn"]))
+        if old is None:
+            continue
+        key = f'{t["session_id"]}#{t["turn"]}'
+        new_total, old_total = t["timings"]["total"], old["timings"]["total"]
+        if new_total > old_total * (1 + tolerance) and new_total - old_total > min_delta:
+            regressions.append(f"{key}: latency {old_total:.3f}s -> {new_total:.3f}s")
+        if t["api_calls"] > old["api_calls"]:
+            regressions.append(f'{key}: api calls {old["api_calls"]} -> {t["api_calls"]}')
+        if t["prompt_chars"] > old["prompt_chars"]:
+            regressions.append(f'{key}: prompt chars {old["prompt_chars"]} -> {t["prompt_chars"]}')
+        if old["output_matches"] and not t["output_matches"]:
+            regressions.append(f"{key}: output no longer matches the recording")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded chatbot sessions offline against a stub model.")
+    parser.add_argument("sessions", help="JSONL file written with CHATBOT_RECORD")
+    parser.add_argument("--api-base", help="Use an already running API instead of starting main.py")
+    parser.add_argument("--report", help="Write the replay report as JSON to this path")
+    parser.add_argument("--baseline", help="Report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative latency increase per turn")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore latency increases below this many seconds")
+    parser.add_argument("--llm-base-latency", type=float, default=0.0, help="Seconds the stub model waits per call")
+    parser.add_argument("--llm-latency-per-kchar", type=float, default=0.0, help="Extra stub seconds per 1000 prompt characters")
+    args = parser.parse_args()
+    for name in ("sessions", "report", "baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    # chatbot reads ./equipment.db and ./pop.db at import time, so import it from the repository directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    import chatbot
+
+    stub = StubModel(args.llm_base_latency, args.llm_latency_per_kchar)
+    chatbot.model = stub
+    chatbot.recorder = SessionRecorder()
+    chatbot.console = Console(record=True, file=io.StringIO())
+
+    proc = None
+    if args.api_base:
+        chatbot.API_BASE = args.api_base
+    else:
+        proc, chatbot.API_BASE = start_api(free_port())
+
+    try:
+        turns = []
+        for recorded_turns in load_sessions(args.sessions).values():
+            for recorded in recorded_turns:
+                turns.append(replay_turn(chatbot, stub, recorded))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {"turns": turns, "summary": summarize(turns)}
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    console = Console()
+    for t in turns:
+        status = "ok" if t["endpoints_match"] and t["output_matches"] else "changed"
+        console.print(
+            f'{t["session_id"]}#{t["turn"]} {t["timings"]["total"]:.3f}s '
+            f'(llm {t["timings"]["llm"]:.3f}s, api {t["timings"]["api"]:.3f}s) '
+            f'{t["api_calls"]} api calls, {t["prompt_chars"]} prompt chars (~{t["prompt_tokens"]} tokens) [{status}] {t["user_input"]}'
+        )
+    s = report["summary"]
+    console.print(
+        f'[bold]{s["turns"]} turns, total {s["total"]:.3f}s, p50 {s["p50"]:.3f}s, p95 {s["p95"]:.3f}s, '
+        f'{s["api_calls"]} api calls, {s["mismatches"]} changed[/bold]'
+    )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(turns, baseline, args.tolerance, args.min_delta)
+        for r in regressions:
+            console.print(f"[red]Regression: {r}[/red]")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
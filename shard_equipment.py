@@ -0,0 +1,79 @@
+import argparse
+import os
+import sqlite3
+import zlib
+
+from sqlalchemy import create_engine
+
+from main import Base, EquipmentORM
+
+BATCH_SIZE = 10000
+
+def shard_for_id(equipment_id, shard_count):
+    return zlib.crc32(str(equipment_id).encode("utf-8")) % shard_count
+
+def load_zone_shards(pop_db, shard_count):
+    # pop_id -> shard, with zones spread round-robin so each zone lands on exactly one shard
+    conn = sqlite3.connect(pop_db)
+    try:
+        rows = conn.execute("SELECT pop_id, zone_code FROM pop").fetchall()
+    finally:
+        conn.close()
+    zones = sorted({zone or "" for _, zone in rows})
+    zone_shard = {zone: i % shard_count for i, zone in enumerate(zones)}
+    return {pop_id: zone_shard[zone or ""] for pop_id, zone in rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split equipment.db into SQLite shards for EQUIPMENT_SHARDS.")
+    parser.add_argument("--shards", type=int, required=True, help="Number of shard files to create")
+    parser.add_argument("--by", choices=["hash", "zone_code"], default="hash", help="Partition by hash of equipment_id or by the POP's zone_code")
+    parser.add_argument("--source", default="./equipment.db")
+    parser.add_argument("--pop-db", default="./pop.db", help="Used to look up zone_code when --by zone_code")
+    parser.add_argument("--out-dir", default="./shards")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    paths = [os.path.join(args.out_dir, f"equipment_{i}.db") for i in range(args.shards)]
+    existing = [path for path in paths if os.path.exists(path)]
+    if existing:
+        raise SystemExit(f"{', '.join(existing)} already exist; remove them or choose another --out-dir")
+    for path in paths:
+        Base.metadata.create_all(create_engine(f"sqlite:///{path}"), tables=[EquipmentORM.__table__])
+
+    pop_shards = load_zone_shards(args.pop_db, args.shards) if args.by == "zone_code" else {}
+    columns = [c.name for c in EquipmentORM.__table__.columns]
+    insert = f"INSERT INTO equipment ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    id_index = columns.index("equipment_id")
+    pop_index = columns.index("pop_id")
+
+    source = sqlite3.connect(args.source)
+    targets = [sqlite3.connect(path) for path in paths]
+    counts = [0] * args.shards
+    try:
+        cursor = source.execute(f"SELECT {', '.join(columns)} FROM equipment")
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            batches = [[] for _ in targets]
+            for row in rows:
+                shard = pop_shards.get(row[pop_index])
+                if shard is None:
+                    shard = shard_for_id(row[id_index], args.shards)
+                batches[shard].append(row)
+            for i, batch in enumerate(batches):
+                targets[i].executemany(insert, batch)
+                counts[i] += len(batch)
+        for target in targets:
+            target.commit()
+    finally:
+        source.close()
+        for target in targets:
+            target.close()
+
+    for path, count in zip(paths, counts):
+        print(f"{path}: {count} rows")
+    print(f"EQUIPMENT_SHARDS={','.join(paths)}")
+
+if __name__ == "__main__":
+    main()
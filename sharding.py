@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+# Comma-separated SQLite files holding the equipment table; empty keeps the single equipment.db
+EQUIPMENT_SHARDS = [p.strip() for p in os.getenv("EQUIPMENT_SHARDS", "").split(",") if p.strip()]
+SHARD_WORKERS = int(os.getenv("EQUIPMENT_SHARD_WORKERS", "0"))
+# How many database files one SQLite connection can ATTACH (10 unless SQLite was compiled otherwise)
+MAX_ATTACHED = sqlite3.connect(":memory:").getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+_pool = None
+_pool_lock = threading.Lock()
+_sessions = {}
+_union_sessions = None
+
+def enabled():
+    return bool(EQUIPMENT_SHARDS)
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = SHARD_WORKERS or min(len(EQUIPMENT_SHARDS), os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def scatter(op, *args):
+    pool = get_pool()
+    futures = [pool.submit(run_on_shard, path, op, args) for path in EQUIPMENT_SHARDS]
+    return [f.result() for f in futures]
+
+# --- Worker side: runs inside the pool processes, one session per shard file ---
+# Database imports stay inside the worker functions so the coordinator merges can be tested without them.
+
+def _session(path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    if path not in _sessions:
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        _sessions[path] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _sessions[path]()
+
+def run_on_shard(path, op, args):
+    db = _session(path)
+    try:
+        return SHARD_OPS[op](db, *args)
+    finally:
+        db.close()
+
+def _row(r):
+    return {c.name: getattr(r, c.name) for c in r.__table__.columns}
+
+def _shard_list(db, params, limit):
+    from main import EquipmentORM, apply_equipment_filters
+    query = apply_equipment_filters(db.query(EquipmentORM), params)
+    return [_row(r) for r in query.order_by(EquipmentORM.equipment_id).limit(limit)]
+
+def _shard_by_id(db, equipment_id):
+    from main import EquipmentORM
+    result = db.query(EquipmentORM).filter(EquipmentORM.equipment_id == equipment_id).first()
+    return _row(result) if result else None
+
+def _shard_count(db, params):
+    from sqlalchemy import func
+    from main import EquipmentORM, apply_equipment_filters
+    query = apply_equipment_filters(db.query(func.count(EquipmentORM.equipment_id)), params)
+    return query.scalar()
+
+def _shard_groupcount(db, params, group_by):
+    from sqlalchemy import func
+    from main import EquipmentORM, apply_equipment_filters
+    group_col = getattr(EquipmentORM, group_by)
+    query = apply_equipment_filters(db.query(group_col, func.count(EquipmentORM.equipment_id)), params)
+    return [tuple(r) for r in query.group_by(group_col)]
+
+def _shard_groupavg(db, params, group_by, avg_field):
+    # Sums and counts rather than averages, so the coordinator can weight each shard correctly
+    from sqlalchemy import func
+    from main import EquipmentORM, apply_equipment_filters
+    group_col = getattr(EquipmentORM, group_by)
+    avg_col = getattr(EquipmentORM, avg_field)
+    query = apply_equipment_filters(db.query(group_col, func.sum(avg_col), func.count(avg_col)), params)
+    return [tuple(r) for r in query.group_by(group_col)]
+
+def _shard_distinct(db, params, field, prefix):
+    # One sorted pass over the shard; only used when there are more shards than one connection can attach
+    from main import EquipmentORM, apply_equipment_distinct_filters, filter_distinct
+    column = getattr(EquipmentORM, field)
+    query = filter_distinct(apply_equipment_distinct_filters(db.query(column), params), column, prefix)
+    return [r[0] for r in query.distinct().order_by(column)]
+
+def _shard_distinct_hll(db, params, field, prefix):
+    from main import EquipmentORM, apply_equipment_distinct_filters, filter_distinct, distinct_hll
+    column = getattr(EquipmentORM, field)
+    query = filter_distinct(apply_equipment_distinct_filters(db.query(column), params), column, prefix)
+    return bytes(distinct_hll(query).registers)
+
+SHARD_OPS = {
+    "list": _shard_list,
+    "by_id": _shard_by_id,
+    "count": _shard_count,
+    "groupcount": _shard_groupcount,
+    "groupavg": _shard_groupavg,
+    "distinct": _shard_distinct,
+    "distinct_hll": _shard_distinct_hll,
+}
+
+# --- Coordinator side: called from the API endpoints, merges the per-shard partials ---
+
+def _nulls_first(value):
+    # SQLite sorts NULL before any value in ascending order
+    return (value is not None, value)
+
+def equipment_list(params, limit):
+    rows = [r for part in scatter("list", params, limit) for r in part]
+    rows.sort(key=lambda r: r["equipment_id"])
+    return rows[:limit]
+
+def equipment_by_id(equipment_id):
+    return next((r for r in scatter("by_id", equipment_id) if r), None)
+
+def equipment_count(params):
+    return sum(scatter("count", params))
+
+def equipment_groupcount(params, group_by, order, limit):
+    totals = Counter()
+    for part in scatter("groupcount", params, group_by):
+        for key, count in part:
+            totals[key] += count
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=(order == "desc"))
+    return [{group_by: key, "count": count} for key, count in ranked[:limit]]
+
+def equipment_groupavg(params, group_by, avg_field, order, limit):
+    sums = defaultdict(float)
+    counts = Counter()
+    for part in scatter("groupavg", params, group_by, avg_field):
+        for key, total, count in part:
+            sums[key] += total or 0
+            counts[key] += count
+    averages = [(key, sums[key] / counts[key] if counts[key] else None) for key in sums]
+    averages.sort(key=lambda kv: _nulls_first(kv[1]), reverse=(order == "desc"))
+    return [{group_by: key, "average": average} for key, average in averages[:limit]]
+
+def equipment_distinct(params, field, prefix, count_only, approx, offset, limit):
+    if approx:
+        from main import HyperLogLog
+        hll = HyperLogLog()
+        for registers in scatter("distinct_hll", params, field, prefix):
+            part = HyperLogLog()
+            part.registers = bytearray(registers)
+            hll.merge(part)
+        return {"count": hll.count(), "approximate": True}
+    if len(EQUIPMENT_SHARDS) <= MAX_ATTACHED:
+        return union_distinct(params, field, prefix, count_only, offset, limit)
+    values = merged_distinct(params, field, prefix)
+    if count_only:
+        return {"count": sum(1 for _ in values)}
+    return list(itertools.islice(values, offset, None if limit is None else offset + limit))
+
+def _union_session():
+    # In-memory SQLite connection with every shard attached and a TEMP VIEW named equipment over their
+    # UNION ALL, so the single-file distinct queries run unchanged and SQLite dedups in one pass
+    global _union_sessions
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    with _pool_lock:
+        if _union_sessions is None:
+            engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+
+            @event.listens_for(engine, "connect")
+            def attach_shards(conn, record):
+                for i, path in enumerate(EQUIPMENT_SHARDS):
+                    conn.execute(f"ATTACH DATABASE ? AS shard{i}", (os.path.abspath(path),))
+                union = " UNION ALL ".join(f"SELECT * FROM shard{i}.equipment" for i in range(len(EQUIPMENT_SHARDS)))
+                conn.execute(f"CREATE TEMP VIEW equipment AS {union}")
+
+            _union_sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _union_sessions()
+
+def union_distinct(params, field, prefix, count_only, offset, limit):
+    from main import EquipmentORM, apply_equipment_distinct_filters, apply_distinct_options
+    db = _union_session()
+    try:
+        column = getattr(EquipmentORM, field)
+        query = apply_equipment_distinct_filters(db.query(column), params)
+        return apply_distinct_options(query, column, prefix, count_only, offset, limit)
+    finally:
+        db.close()
+
+def merged_distinct(params, field, prefix):
+    # Sorted union of all shards: every shard's sorted pass is submitted before any result is consumed
+    pool = get_pool()
+    futures = [pool.submit(run_on_shard, path, "distinct", (params, field, prefix)) for path in EQUIPMENT_SHARDS]
+    previous = object()
+    for value in heapq.merge(*(f.result() for f in futures)):
+        if value != previous:
+            yield value
+            previous = value
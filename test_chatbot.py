@@ -0,0 +1,97 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("rich")
+
+from rich.console import Console
+
+import chatbot
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+@pytest.fixture
+def run(monkeypatch):
+    """Runs one chatbot turn with a canned model interpretation and API payload; returns (output, urls)."""
+    def run_turn(user_input, interpretation, payload):
+        urls = []
+
+        def get(url):
+            urls.append(url)
+            return FakeResponse(payload)
+
+        monkeypatch.setattr(chatbot, "model", SimpleNamespace(generate_content=lambda prompt: SimpleNamespace(text=json.dumps(interpretation))))
+        monkeypatch.setattr(chatbot.requests, "get", get)
+        monkeypatch.setattr(chatbot, "console", Console(record=True, file=io.StringIO(), width=200))
+        turn = chatbot.run_turn(user_input)
+        return turn["output"], urls
+    return run_turn
+
+def test_count_only_endpoint_prints_count_without_how_many_wording(run):
+    output, urls = run(
+        "count the unique oem names",
+        {"entity": "equipment", "endpoint": "/equipment/distinct/?field=oem_name&count_only=true", "fields": ["oem_name"]},
+        {"count": 7},
+    )
+    assert "Number of types: 7" in output
+    assert "No results" not in output
+    assert "limit=" not in urls[0]
+
+def test_how_many_wording_still_requests_count_only(run):
+    output, urls = run(
+        "how many oem names are there",
+        {"entity": "equipment", "endpoint": "/equipment/distinct/?field=oem_name", "fields": ["oem_name"]},
+        {"count": 3},
+    )
+    assert urls[0].endswith("/equipment/distinct/?field=oem_name&count_only=true")
+    assert "Number of types: 3" in output
+
+def test_full_distinct_page_reports_more_values(run):
+    values = [f"v{i}" for i in range(chatbot.DISTINCT_LIMIT)]
+    output, urls = run(
+        "list all oem names",
+        {"entity": "equipment", "endpoint": "/equipment/distinct/?field=oem_name", "fields": ["oem_name"]},
+        values,
+    )
+    assert f"limit={chatbot.DISTINCT_LIMIT}" in urls[0]
+    assert f"from offset {chatbot.DISTINCT_LIMIT}" in output
+
+def test_partial_distinct_page_has_no_more_notice(run):
+    output, _ = run(
+        "list all oem names",
+        {"entity": "equipment", "endpoint": "/equipment/distinct/?field=oem_name&offset=100", "fields": ["oem_name"]},
+        ["Cisco", "Juniper"],
+    )
+    assert "Juniper" in output
+    assert "there may be more" not in output
+
+DEVICE_TYPES = {
+    "all": ["Access Switch", "Core Router", "Broadband Network Gateway"],
+    "switches": ["Access Switch"],
+    "routers": ["Core Router", "Broadband Network Gateway"],
+}
+
+@pytest.mark.parametrize("endpoint, expected", [
+    ("/equipment/?equipment_subtype=router&limit=10", "/equipment/?equipment_subtype=Core Router,Broadband Network Gateway&limit=10"),
+    ("/equipment/?equipment_subtype=routers", "/equipment/?equipment_subtype=Core Router,Broadband Network Gateway"),
+    ("/equipment/count/?equipment_subtype=switches&pop_name=Delhi", "/equipment/count/?equipment_subtype=Access Switch&pop_name=Delhi"),
+    ("/equipment/?equipment_subtype=Devices", "/equipment/?equipment_subtype=Access Switch,Core Router,Broadband Network Gateway"),
+    ("/equipment/?equipment_subtype=switch,router", "/equipment/?equipment_subtype=Access Switch,Core Router,Broadband Network Gateway"),
+    ("/equipment/?equipment_subtype=switch,Core Router", "/equipment/?equipment_subtype=Access Switch,Core Router"),
+    # Real subtype values that merely contain a placeholder word are left alone
+    ("/equipment/?equipment_subtype=Access Switch", "/equipment/?equipment_subtype=Access Switch"),
+    ("/equipment/?equipment_subtype=Core Router&limit=10", "/equipment/?equipment_subtype=Core Router&limit=10"),
+    ("/equipment/?equipment_subtype=routerboard", "/equipment/?equipment_subtype=routerboard"),
+])
+def test_expand_equipment_subtype(monkeypatch, endpoint, expected):
+    monkeypatch.setattr(chatbot, "DEVICE_TYPE_LISTS", DEVICE_TYPES)
+    assert chatbot.expand_equipment_subtype(endpoint) == expected
@@ -0,0 +1,31 @@
+from prompt_builder import Catalog, PromptBuilder
+
+CATALOG = Catalog({
+    "pop_name": ["Agartala", "Agra", "Ahmedabad", "Delhi", ""],
+    "state_name": ["Uttar Pradesh", "UP", "Tripura"],
+    "equipment_subtype": ["Access Switch", "Core Router"],
+})
+
+def test_candidates_match_misspelled_value():
+    assert CATALOG.candidates("pop_name", "hostnames at agartla")[0] == "Agartala"
+
+def test_candidates_match_two_character_word():
+    assert "UP" in CATALOG.candidates("state_name", "devices in up")
+
+def test_candidates_ignore_unrelated_and_unknown_fields():
+    assert CATALOG.candidates("pop_name", "tripura") == []
+    assert CATALOG.candidates("oem_name", "agartala") == []
+
+def test_candidates_respect_limit():
+    assert len(CATALOG.candidates("pop_name", "agartala agra ahmedabad delhi", limit=2)) == 2
+
+def test_catalog_drops_empty_and_duplicate_values():
+    catalog = Catalog({"pop_name": ["Delhi", "", None, "Delhi"]})
+    assert catalog.size("pop_name") == 1
+
+def test_prompt_includes_only_matching_values():
+    prompt, stats = PromptBuilder(CATALOG).build("count access switches at agartla")
+    assert "pop_name: Agartala" in prompt
+    assert "Ahmedabad" not in prompt
+    assert "equipment_subtype values matching the query: Access Switch" in prompt
+    assert set(stats["sections"]) == {"instructions", "normalization", "values", "devices", "columns", "query"}
@@ -0,0 +1,69 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("rich")
+
+from rich.console import Console
+
+import chatbot
+from recorder import SessionRecorder, load_sessions
+from replay import StubModel, find_regressions, replay_turn, summarize
+
+INTERPRETATION = {"entity": "equipment", "endpoint": "/equipment/?pop_name=Agartala&fields=hostname&limit=10", "fields": ["hostname"]}
+ROWS = [{"hostname": "agt-sw-01"}, {"hostname": "agt-rt-01"}]
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.status_code = 200
+
+    def json(self):
+        return self.payload
+
+def serve(monkeypatch, answer):
+    """Stubs chatbot's HTTP layer; answer(url) returns the JSON payload for each request."""
+    monkeypatch.setattr(chatbot.requests, "get", lambda url: FakeResponse(answer(url)))
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """Records one turn with a stub model and stub API into a JSONL file and returns the loaded turn."""
+    path = tmp_path / "session.jsonl"
+    monkeypatch.setattr(chatbot, "model", SimpleNamespace(generate_content=lambda prompt: SimpleNamespace(text=json.dumps(INTERPRETATION))))
+    monkeypatch.setattr(chatbot, "recorder", SessionRecorder(str(path), session_id="s1"))
+    monkeypatch.setattr(chatbot, "console", Console(record=True, file=io.StringIO(), width=200))
+    serve(monkeypatch, lambda url: ROWS)
+    chatbot.run_turn("hostnames at agartla")
+    [turns] = load_sessions(str(path)).values()
+    return turns[0]
+
+def replay(monkeypatch, recorded, stub):
+    monkeypatch.setattr(chatbot, "model", stub)
+    monkeypatch.setattr(chatbot, "recorder", SessionRecorder())
+    return replay_turn(chatbot, stub, recorded)
+
+def test_recorded_turn_replays_identically(session, monkeypatch):
+    assert session["llm_calls"][0]["output"] == json.dumps(INTERPRETATION)
+    assert len(session["api_calls"]) == 1 and "pop_name=" in session["api_calls"][0]["endpoint"]
+    assert "agt-sw-01" in session["output"]
+
+    turn = replay(monkeypatch, session, StubModel())
+    assert turn["endpoints_match"] and turn["output_matches"]
+    assert turn["api_calls"] == 1
+    assert find_regressions([turn], {"turns": [turn]}, tolerance=0.2, min_delta=0.005) == []
+
+def test_find_regressions_flags_slower_turn_with_more_api_calls(session, monkeypatch):
+    baseline = {"turns": [replay(monkeypatch, session, StubModel())]}
+    baseline["summary"] = summarize(baseline["turns"])
+
+    # A slower model and an API that comes back empty for the pop_name filter, forcing fetch_api's retry
+    serve(monkeypatch, lambda url: [] if "pop_name=" in url else ROWS)
+    turn = replay(monkeypatch, session, StubModel(base_latency=0.05))
+
+    regressions = find_regressions([turn], baseline, tolerance=0.2, min_delta=0.005)
+    assert any("latency" in r for r in regressions)
+    assert "s1#0: api calls 1 -> 2" in regressions
+    assert "s1#0: output no longer matches the recording" in regressions
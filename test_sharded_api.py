@@ -0,0 +1,124 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import main
+import shard_equipment
+import sharding
+
+POPS = [(1, "Agartala", "NE"), (2, "Agra", "N"), (3, "Ahmedabad", "W"), (4, "Bhopal", "C"),
+        (5, "Delhi", "N"), (6, "Guwahati", "NE"), (7, "Pune", "W"), (8, "Surat", "W")]
+SUBTYPES = ["Access Switch", "Core Router", "Broadband Network Gateway", ""]
+
+QUERIES = [
+    "/equipment/?limit=100",
+    "/equipment/?limit=5",
+    "/equipment/?pop_name=agra&fields=hostname,ip_address&limit=100",
+    "/equipment/7",
+    "/equipment/count/",
+    "/equipment/count/?oem_name=cisco",
+    "/equipment/count/?equipment_subtype=Access Switch,Core Router",
+    "/equipment/groupcount/?group_by=pop_name&order=desc&limit=3",
+    "/equipment/groupcount/?group_by=pop_name&order=asc&limit=100",
+    "/equipment/groupavg/?group_by=pop_name&avg_field=equipment_id&order=desc&limit=4",
+    "/equipment/groupavg/?group_by=pop_name&avg_field=pop_id&order=asc&limit=100",
+    "/equipment/distinct/?field=hostname",
+    "/equipment/distinct/?field=hostname&offset=3&limit=4",
+    "/equipment/distinct/?field=hostname&prefix=SW",
+    "/equipment/distinct/?field=hostname&pop_name=Delhi",
+    "/equipment/distinct/?field=hostname&count_only=true",
+    "/equipment/distinct/?field=equipment_subtype",
+    "/equipment/distinct/?field=oem_name&equipment_subtype=core router&count_only=true",
+    "/equipment/subtypes/",
+]
+
+@pytest.fixture
+def databases(tmp_path):
+    """A small equipment.db and pop.db; POP n has n devices so group results have no ties."""
+    equipment_db, pop_db = tmp_path / "equipment.db", tmp_path / "pop.db"
+    rows, equipment_id = [], 0
+    for pop_id, pop_name, _ in POPS:
+        for j in range(pop_id):
+            equipment_id += 1
+            rows.append(main.EquipmentORM(
+                equipment_id=equipment_id, pop_id=pop_id, pop_name=pop_name, pop_code=pop_name[:3].upper(),
+                hostname=None if equipment_id % 11 == 0 else f"{'sw' if j % 2 else 'rt'}-{j:02d}",
+                equipment_subtype=SUBTYPES[equipment_id % len(SUBTYPES)],
+                oem_name=["Cisco", "Juniper", "Nokia"][equipment_id % 3],
+                ip_address=f"10.0.{pop_id}.{j}", model_name=f"M{j % 4}",
+            ))
+    pops = [main.PopORM(pop_id=pop_id, pop_name=name, zone_code=zone) for pop_id, name, zone in POPS]
+    for path, objects in ((equipment_db, rows), (pop_db, pops)):
+        engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+        main.Base.metadata.create_all(engine, tables=[objects[0].__table__])
+        with sessionmaker(bind=engine)() as db:
+            db.add_all(objects)
+            db.commit()
+        engine.dispose()
+    return equipment_db, pop_db
+
+@pytest.fixture
+def client(databases, monkeypatch):
+    engine = sqlalchemy.create_engine(f"sqlite:///{databases[0]}", connect_args={"check_same_thread": False})
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_equipment_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(main.app.dependency_overrides, main.get_equipment_db, get_equipment_db)
+    yield TestClient(main.app)
+    engine.dispose()
+
+@pytest.fixture
+def shard_state(monkeypatch):
+    """Resets the process pool and attached-shard connection around a test that changes EQUIPMENT_SHARDS."""
+    monkeypatch.setattr(sharding, "_union_sessions", None)
+    yield
+    if sharding._pool is not None:
+        sharding._pool.shutdown()
+        sharding._pool = None
+    sharding._union_sessions = None
+
+def responses(client):
+    results = {url: (r.status_code, r.json()) for url in QUERIES for r in [client.get(url)]}
+    # The single-file subtypes query has no ORDER BY, so only the members of each list are comparable
+    status, subtypes = results["/equipment/subtypes/"]
+    results["/equipment/subtypes/"] = (status, {k: sorted(v) for k, v in subtypes.items()})
+    return results
+
+@pytest.mark.parametrize("by, shards, max_attached", [
+    ("hash", 2, sharding.MAX_ATTACHED),
+    ("hash", 3, sharding.MAX_ATTACHED),
+    ("zone_code", 3, sharding.MAX_ATTACHED),
+    ("hash", 3, 0),  # more shards than one connection can attach: distinct merges per-shard passes
+])
+def test_sharded_endpoints_match_single_file(client, databases, tmp_path, monkeypatch, shard_state, by, shards, max_attached):
+    equipment_db, pop_db = databases
+    expected = responses(client)
+    assert expected["/equipment/count/"] == (200, {"count": 36})
+
+    out_dir = tmp_path / "shards"
+    shard_equipment.main(["--shards", str(shards), "--by", by, "--source", str(equipment_db),
+                          "--pop-db", str(pop_db), "--out-dir", str(out_dir)])
+    monkeypatch.setattr(sharding, "EQUIPMENT_SHARDS", [str(out_dir / f"equipment_{i}.db") for i in range(shards)])
+    monkeypatch.setattr(sharding, "MAX_ATTACHED", max_attached)
+
+    assert responses(client) == expected
+
+def test_shard_equipment_refuses_existing_outputs_without_writing(databases, tmp_path):
+    equipment_db, pop_db = databases
+    out_dir = tmp_path / "shards"
+    out_dir.mkdir()
+    (out_dir / "equipment_1.db").write_bytes(b"")
+    with pytest.raises(SystemExit):
+        shard_equipment.main(["--shards", "3", "--source", str(equipment_db), "--out-dir", str(out_dir)])
+    assert sorted(p.name for p in out_dir.iterdir()) == ["equipment_1.db"]
@@ -0,0 +1,82 @@
+from concurrent.futures import Future
+
+import pytest
+
+import sharding
+
+class InlinePool:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def fake_shards(monkeypatch, data):
+    """data maps shard path -> {op: partial result}; "values" holds the shard's distinct values."""
+    def run_on_shard(path, op, args):
+        if op == "distinct":
+            return sorted(data[path]["values"])
+        return data[path][op]
+
+    monkeypatch.setattr(sharding, "EQUIPMENT_SHARDS", list(data))
+    # More shards than one connection can attach, so distinct merges the per-shard passes
+    monkeypatch.setattr(sharding, "MAX_ATTACHED", 0)
+    monkeypatch.setattr(sharding, "get_pool", lambda: InlinePool())
+    monkeypatch.setattr(sharding, "run_on_shard", run_on_shard)
+
+def test_groupcount_sums_groups_split_across_shards_before_top_k(monkeypatch):
+    fake_shards(monkeypatch, {
+        "a": {"groupcount": [("Delhi", 3), ("Agra", 1)]},
+        "b": {"groupcount": [("Agra", 4), ("Pune", 2)]},
+    })
+    result = sharding.equipment_groupcount({}, "pop_name", "desc", 2)
+    assert result == [{"pop_name": "Agra", "count": 5}, {"pop_name": "Delhi", "count": 3}]
+
+def test_groupavg_weights_shards_by_row_count(monkeypatch):
+    # Agra: (10 + 2 + 3) / 3 = 5, not the mean of shard averages (5 + 2.5) / 2
+    fake_shards(monkeypatch, {
+        "a": {"groupavg": [("Agra", 10, 1), ("Delhi", 8, 2)]},
+        "b": {"groupavg": [("Agra", 5, 2)]},
+    })
+    result = sharding.equipment_groupavg({}, "pop_name", "equipment_id", "desc", 10)
+    assert result == [{"pop_name": "Agra", "average": 5.0}, {"pop_name": "Delhi", "average": 4.0}]
+
+@pytest.mark.parametrize("order, expected", [
+    ("asc", [None, 1.0, 9.0]),
+    ("desc", [9.0, 1.0, None]),
+])
+def test_groupavg_orders_null_averages_like_sqlite(monkeypatch, order, expected):
+    fake_shards(monkeypatch, {
+        "a": {"groupavg": [("A", 9, 1), ("B", None, 0)]},
+        "b": {"groupavg": [("C", 1, 1), ("B", None, 0)]},
+    })
+    result = sharding.equipment_groupavg({}, "pop_name", "model_code", order, 10)
+    assert [r["average"] for r in result] == expected
+
+def test_groupavg_applies_limit_after_merge(monkeypatch):
+    # Shard a alone would rank X first; merged with shard b, Y is the top group
+    fake_shards(monkeypatch, {
+        "a": {"groupavg": [("X", 10, 1), ("Y", 9, 1)]},
+        "b": {"groupavg": [("X", 0, 3), ("Y", 9, 1)]},
+    })
+    assert sharding.equipment_groupavg({}, "pop_name", "equipment_id", "desc", 1) == [{"pop_name": "Y", "average": 9.0}]
+
+DISTINCT_SHARDS = {
+    "a": {"values": ["a", "c", "e", "g", "h"]},
+    "b": {"values": ["b", "c", "d", "g"]},
+    "c": {"values": []},
+}
+
+def test_distinct_count_only_counts_union_across_shards(monkeypatch):
+    fake_shards(monkeypatch, DISTINCT_SHARDS)
+    assert sharding.equipment_distinct({}, "hostname", None, True, False, 0, None) == {"count": 7}
+
+@pytest.mark.parametrize("offset, limit, expected", [
+    (0, None, ["a", "b", "c", "d", "e", "g", "h"]),
+    (0, 3, ["a", "b", "c"]),
+    (3, 3, ["d", "e", "g"]),
+    (6, 3, ["h"]),
+    (7, 3, []),
+])
+def test_distinct_pages_match_sorted_union(monkeypatch, offset, limit, expected):
+    fake_shards(monkeypatch, DISTINCT_SHARDS)
+    assert sharding.equipment_distinct({}, "hostname", None, False, False, offset, limit) == expected